@@ -1,11 +1,18 @@
+import mmap
+import numpy as np
+import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib2 import Path
 
-def load_document(name:str|Path) -> str:
+def get_document_path(name:str|Path) -> Path:
     if isinstance(name, str):
         name = parent_path.joinpath(name)
     if parent_path not in name.parents:
         raise FileNotFoundError("File is not in the correct directory!")
-    with open(name, "rt") as file:
+    return name
+
+def load_document(name:str|Path) -> str:
+    with open(get_document_path(name), "rt") as file:
         return file.read()
 
 def parse_input(document:str) -> list[str]:
@@ -17,20 +24,105 @@ def parse_input(document:str) -> list[str]:
 def get_calibration_values1(lines:list[str]) -> list[int]:
     return [int((digits:=[char for char in line if char.isdigit()])[0] + digits[-1]) for line in lines]
 
-def scan_string(string:str) -> str:
-    DIGITS = [("one", "1"), ("two", "2"), ("three", "3"), ("four", "4"), ("five", "5"), ("six", "6"), ("seven", "7"), ("eight", "8"), ("nine", "9")]
-    output:str = ""
-    for char_index, char in enumerate(string):
-        if char.isdigit(): output += char
-        for old, new in DIGITS:
-            if len(old) <= len(string) - char_index:
-                if string[char_index:char_index + len(old)] == old:
-                    output += new
-                    break
-    return output
+def get_calibration_values1_numpy(document:str) -> np.ndarray:
+    '''Alternative to `get_calibration_values1` that takes the whole document and finds the first and last digit of every line
+    with array operations over its bytes.'''
+    buffer = np.frombuffer(document.encode(), dtype=np.uint8)
+    newline_mask = buffer == ord("\n")
+    digit_mask = (buffer >= ord("0")) & (buffer <= ord("9"))
+    letter_mask = ((buffer | 0x20) >= ord("a")) & ((buffer | 0x20) <= ord("z"))
+    newline_positions = np.flatnonzero(newline_mask)
+    line_starts = np.concatenate(([0], newline_positions + 1))
+    line_stops = np.concatenate((newline_positions, [len(buffer)]))
+    if not np.all(digit_mask | letter_mask | newline_mask) or np.any(line_starts == line_stops):
+        raise ValueError("Document does not contain only alpha-numeric characters and newlines!")
+    digit_positions = np.flatnonzero(digit_mask)
+    first_digit_indices = np.searchsorted(digit_positions, line_starts)
+    last_digit_indices = np.searchsorted(digit_positions, line_stops) - 1
+    if np.any(first_digit_indices > last_digit_indices):
+        raise ValueError("Line does not contain any digits!")
+    first_digits = buffer[digit_positions[first_digit_indices]].astype(np.int64) - ord("0")
+    last_digits = buffer[digit_positions[last_digit_indices]].astype(np.int64) - ord("0")
+    return first_digits * 10 + last_digits
+
+DIGIT_WORDS = [("one", "1"), ("two", "2"), ("three", "3"), ("four", "4"), ("five", "5"), ("six", "6"), ("seven", "7"), ("eight", "8"), ("nine", "9")] + [(str(digit), str(digit)) for digit in range(10)]
+
+def build_trie(words:list[tuple[str,str]]) -> dict:
+    '''Builds a nested dict trie of `words`; the value of a complete word is stored under the key `None`.'''
+    trie:dict = {}
+    for word, value in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[None] = value
+    return trie
+
+FORWARD_TRIE = build_trie(DIGIT_WORDS)
+BACKWARD_TRIE = build_trie([(word[::-1], value) for word, value in DIGIT_WORDS])
+
+def match_trie(string:str, start_index:int, trie:dict, step:int) -> str|None:
+    '''Walks `trie` from `start_index` in the direction of `step`; returns the value of the first complete word found.'''
+    node = trie
+    index = start_index
+    while 0 <= index < len(string):
+        node = node.get(string[index])
+        if node is None: return None
+        if None in node: return node[None]
+        index += step
+    return None
+
+def scan_string(string:str) -> tuple[str,str]:
+    '''Returns the first and last digit (spelled out or not) in the string, reading only as far in from each end as needed.'''
+    for char_index in range(len(string)):
+        if (first_digit := match_trie(string, char_index, FORWARD_TRIE, 1)) is not None: break
+    else:
+        raise ValueError("String \"%s\" does not contain any digits!" % string)
+    for char_index in range(len(string) - 1, -1, -1):
+        if (last_digit := match_trie(string, char_index, BACKWARD_TRIE, -1)) is not None: break
+    return first_digit, last_digit
 
 def get_calibration_values2(lines:list[str]) -> list[int]:
-    return [int((digits:=scan_string(line))[0] + digits[-1]) for line in lines]
+    return [int("".join(scan_string(line))) for line in lines]
+
+def get_chunk_bounds(buffer:mmap.mmap, chunk_size:int) -> list[tuple[int,int]]:
+    '''Splits the buffer into `(start, stop)` chunks of about `chunk_size` bytes. Each stop is on a newline (or the end of the
+    buffer), and the newline itself belongs to neither chunk.'''
+    bounds:list[tuple[int,int]] = []
+    start = 0
+    while True:
+        stop = buffer.find(b"\n", min(start + chunk_size, len(buffer)))
+        if stop == -1:
+            bounds.append((start, len(buffer)))
+            return bounds
+        bounds.append((start, stop))
+        start = stop + 1
+
+def get_chunk_calibration_sums(path:str, start:int, stop:int) -> tuple[int,int]:
+    '''Validates the lines in `[start, stop)` of the file and returns `(part_1_sum, part_2_sum)` for them.'''
+    with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        lines = buffer[start:stop].decode().split("\n")
+    sum1 = 0
+    sum2 = 0
+    for line in lines:
+        if not line.isalnum():
+            raise ValueError("Document does not contain only alpha-numeric characters and newlines!")
+        digits = [char for char in line if char.isdigit()]
+        sum1 += int(digits[0] + digits[-1])
+        sum2 += int("".join(scan_string(line)))
+    return sum1, sum2
+
+def get_calibration_sums_streaming(name:str|Path, chunk_size:int=16 * 1024 * 1024, workers:int|None=None) -> tuple[int,int]:
+    '''Returns `(part_1_sum, part_2_sum)` for a document without loading it into memory. The file is memory-mapped and split
+    into newline-aligned chunks, which are validated and summed in one pass each on a process pool.'''
+    path = str(get_document_path(name))
+    if os.path.getsize(path) == 0:
+        raise ValueError("Document does not contain only alpha-numeric characters and newlines!")
+    with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        chunk_bounds = get_chunk_bounds(buffer, chunk_size)
+    starts, stops = zip(*chunk_bounds)
+    with ProcessPoolExecutor(workers) as executor:
+        partial_sums = list(executor.map(get_chunk_calibration_sums, [path] * len(chunk_bounds), starts, stops))
+    return sum(sum1 for sum1, sum2 in partial_sums), sum(sum2 for sum1, sum2 in partial_sums)
 
 def main() -> None:
     document_string = load_document("Input.txt")
@@ -1,12 +1,18 @@
+import gc
+import numpy as np
+import re
 from pathlib2 import Path
-from typing import Iterable
+from typing import Generator, Iterable
 
-def load_document(name:str) -> str:
+def get_document_path(name:str|Path) -> Path:
     if isinstance(name, str):
         name = parent_path.joinpath(name)
     if parent_path not in name.parents:
         raise FileNotFoundError("File is not in the correct directory!")
-    with open(name, "rt") as file:
+    return name
+
+def load_document(name:str|Path) -> str:
+    with open(get_document_path(name), "rt") as file:
         return file.read()
 
 class ParserState():
@@ -96,14 +102,6 @@ def parse_bag_pick(state:ParserState) -> tuple[str,int]:
                 raise ValueError("Amount string is not digit!")
     raise ValueError("Encountered end of loop")
 
-# import re
-# # Game 1: 3 blue, 4 red; 1 red, 2 green, 6 blue; 2 green
-# def parse_line(line: str): # -> tuple[int, list[tuple[int, str]]]:
-#     parser = r"Game (\d+):(?: ?(?: ?(\d+) (\w+),?)+;?)+"
-#     # "1 blue, 2 green"
-#     matches = re.findall(parser, line)
-#     print(matches)
-
 def parse_round(state:ParserState) -> tuple[int,int,int]:
     '''Parses "3 blue, 4 red", returns `(red_amount, green_amount, blue_amount)`.'''
     COLOR_ORDER = ["red", "green", "blue"]
@@ -146,6 +144,86 @@ def parse_input(document:str) -> dict[int,list[tuple[int,int,int]]]:
         state.increment()
     return games
 
+COLOR_INDICES = {"red": 0, "green": 1, "blue": 2}
+# possessive so that the matcher never backtracks; ASCII so that every digit is one byte for `parse_input_fast`
+LINE_PATTERN = re.compile(r"Game \d++: \d++ (?:red|green|blue)(?:(?:, |; )\d++ (?:red|green|blue))*+", re.ASCII)
+DOCUMENT_PATTERN = re.compile(r"(?:%s(?:\n(?=.)|\n?\Z))++" % LINE_PATTERN.pattern, re.ASCII)
+GAME_ID_PATTERN = re.compile(r"Game \d+: ", re.ASCII)
+BAG_PICK_PATTERN = re.compile(r"\d+ (?:red|green|blue)", re.ASCII)
+BAG_PICK_SEPARATOR_PATTERN = re.compile(r", |; ")
+MAX_INT64_DIGITS = 18 # numbers with more digits than this are parsed as Python ints instead
+
+def get_line_error(line:str, line_start:int) -> ValueError:
+    '''Returns an error giving the index in the document at which `line` stops being a valid game.'''
+    if (match := GAME_ID_PATTERN.match(line)) is None:
+        return ValueError("Game ID container at index %i does not match \"Game <id>: \"!" % line_start)
+    index = match.end()
+    while index < len(line):
+        if (match := BAG_PICK_PATTERN.match(line, index)) is None:
+            return ValueError("Invalid bag pick at index %i!" % (line_start + index))
+        index = match.end()
+        if index == len(line): break
+        if (match := BAG_PICK_SEPARATOR_PATTERN.match(line, index)) is None:
+            return ValueError("Bag pick separator at index %i is not \", \" or \"; \"!" % (line_start + index))
+        index = match.end()
+    return ValueError("Game at index %i ends unexpectedly!" % (line_start + index))
+
+def get_document_error(document:str) -> ValueError:
+    '''Returns an error for the first invalid line of `document`.'''
+    line_start = 0
+    for line in document.split("\n"):
+        if LINE_PATTERN.fullmatch(line) is None:
+            return get_line_error(line, line_start)
+        line_start += len(line) + 1
+    return ValueError("Document is not a valid game log!")
+
+def parse_rounds_fast(rounds_string:str) -> list[tuple[int,int,int]]:
+    '''Parses an already validated "3 blue, 4 red; 1 red, 2 green, 6 blue; 2 green", returns [(r, g, b), (r, g, b), (r, g, b)]'''
+    rounds:list[tuple[int,int,int]] = []
+    for round_string in rounds_string.split("; "):
+        bag_picks = [0, 0, 0]
+        for bag_pick in round_string.split(", "):
+            amount, _, color = bag_pick.partition(" ")
+            bag_picks[COLOR_INDICES[color]] = int(amount)
+        rounds.append(tuple(bag_picks))
+    return rounds
+
+def parse_input_fast(document:str) -> dict[int,list[tuple[int,int,int]]]:
+    '''Same as `parse_input`, but validates the whole document with one compiled pattern and then tokenizes all of its bytes at
+    once with NumPy. Every number is followed by ":" if it is a game ID, or by " " and the first letter of its color.'''
+    if DOCUMENT_PATTERN.fullmatch(document) is None:
+        raise get_document_error(document)
+    buffer = np.frombuffer(document.encode("ascii"), dtype=np.uint8)
+    is_digit = (buffer >= ord("0")) & (buffer <= ord("9"))
+    edges = np.diff(is_digit.view(np.int8), prepend=np.int8(0), append=np.int8(0))
+    number_starts = np.flatnonzero(edges == 1)
+    number_stops = np.flatnonzero(edges == -1)
+    if np.any(number_stops - number_starts > MAX_INT64_DIGITS):
+        return dict(iterate_games(document.removesuffix("\n").split("\n")))
+    digit_positions = np.flatnonzero(is_digit)
+    # each digit times its place value, summed over each number's run of digits
+    digit_number_indices = np.cumsum(edges[digit_positions] == 1) - 1
+    place_values = np.power(10, number_stops[digit_number_indices] - digit_positions - 1, dtype=np.int64)
+    number_first_digits = np.flatnonzero(edges[digit_positions] == 1)
+    numbers = np.add.reduceat((buffer[digit_positions] - ord("0")).astype(np.int64) * place_values, number_first_digits)
+
+    is_game_id = buffer[number_stops] == ord(":")
+    round_starts = np.sort(np.concatenate((number_starts[is_game_id], np.flatnonzero(buffer == ord(";")))))
+    pick_round_indices = np.searchsorted(round_starts, number_starts[~is_game_id], side="right") - 1
+    color_letters = buffer[number_stops[~is_game_id] + 1]
+    cube_amounts = np.zeros((len(round_starts), 3), dtype=np.int64)
+    cube_amounts[pick_round_indices, (color_letters == ord("g")) + 2 * (color_letters == ord("b"))] = numbers[~is_game_id]
+    game_round_offsets = np.searchsorted(round_starts, number_starts[is_game_id]).tolist() + [len(round_starts)]
+
+    # building millions of tuples would otherwise set off the cyclic garbage collector over and over
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        rounds = list(map(tuple, cube_amounts.tolist()))
+        return dict(zip(numbers[is_game_id].tolist(), (rounds[start:stop] for start, stop in zip(game_round_offsets[:-1], game_round_offsets[1:]))))
+    finally:
+        if gc_was_enabled: gc.enable()
+
 def get_possible_game_ids(games:dict[int,list[tuple[int,int,int]]], maximum_allowed:tuple[int,int,int]) -> list[int]:
     '''Returns a list of game ids for games which have all rounds under their maximum values.'''
     output:list[int] = []
@@ -171,6 +249,70 @@ def get_minimum_possible_cubes(games:dict[int,list[tuple[int,int,int]]]) -> dict
         output[game_id] = tuple(minimum_cubes)
     return output
 
+def iterate_games(lines:Iterable[str]) -> Generator[tuple[int,list[tuple[int,int,int]]],None,None]:
+    '''Parses games one line at a time (e.g. from a file object), yielding `(game_id, rounds)` for each one.'''
+    line_start = 0
+    for line in lines:
+        line = line.removesuffix("\n")
+        if LINE_PATTERN.fullmatch(line) is None:
+            raise get_line_error(line, line_start)
+        game_id_string, _, rounds_string = line.partition(": ")
+        yield int(game_id_string[5:]), parse_rounds_fast(rounds_string)
+        line_start += len(line) + 1
+
+def iterate_game_answers(lines:Iterable[str], maximum_allowed:tuple[int,int,int]) -> Generator[tuple[int,int],None,None]:
+    '''Yields the running `(part_1_answer, part_2_answer)` after each game parsed from `lines`.'''
+    possible_game_id_sum = 0
+    power_sum = 0
+    for game_id, game_rounds in iterate_games(lines):
+        minimum_cubes = [max(round_amounts) for round_amounts in zip(*game_rounds)]
+        if all(minimum <= max_amount for minimum, max_amount in zip(minimum_cubes, maximum_allowed)):
+            possible_game_id_sum += game_id
+        power_sum += product(minimum_cubes)
+        yield possible_game_id_sum, power_sum
+
+def get_answers_streaming(name:str|Path, maximum_allowed:tuple[int,int,int]) -> tuple[int,int]:
+    '''Returns `(part_1_answer, part_2_answer)` for a document while only holding one game in memory at a time.'''
+    answers = (0, 0)
+    with open(get_document_path(name), "rt") as file:
+        for answers in iterate_game_answers(file, maximum_allowed): pass
+    return answers
+
+class GameStore():
+    '''Stores the rounds of all games as flat red, green and blue columns, with `offsets[i]:offsets[i + 1]` being the rounds
+    of the game `game_ids[i]`. The per-game maxima are precomputed so that many limits can be checked at once.'''
+    def __init__(self, games:dict[int,list[tuple[int,int,int]]]) -> None:
+        self.game_ids = np.array(list(games.keys()), dtype=np.int64)
+        self.offsets = np.zeros(len(games) + 1, dtype=np.int64)
+        np.cumsum([len(game_rounds) for game_rounds in games.values()], out=self.offsets[1:])
+        rounds = np.array([round for game_rounds in games.values() for round in game_rounds], dtype=np.int64).reshape(-1, 3)
+        self.red = np.ascontiguousarray(rounds[:, 0])
+        self.green = np.ascontiguousarray(rounds[:, 1])
+        self.blue = np.ascontiguousarray(rounds[:, 2])
+        if np.any(self.offsets[1:] == self.offsets[:-1]):
+            raise ValueError("Game has no rounds!")
+        self.maxima = np.maximum.reduceat(rounds, self.offsets[:-1], axis=0) if len(games) > 0 else np.zeros((0, 3), dtype=np.int64)
+
+    def get_possible_game_ids(self, maximum_allowed:tuple[int,int,int]) -> list[int]:
+        '''Returns a list of game ids for games which have all rounds under their maximum values.'''
+        return self.game_ids[np.all(self.maxima <= np.array(maximum_allowed), axis=1)].tolist()
+
+    def get_possible_game_id_sums(self, limits:list[tuple[int,int,int]]|np.ndarray, batch_cells:int=2**24) -> np.ndarray:
+        '''Returns the sum of possible game ids for each `(r, g, b)` limit. Limits are checked in batches of at most
+        `batch_cells` limit-game pairs so that memory stays bounded.'''
+        limits = np.asarray(limits, dtype=np.int64).reshape(-1, 3)
+        output = np.zeros(len(limits), dtype=np.int64)
+        batch_size = max(1, batch_cells // max(1, len(self.game_ids)))
+        for batch_start in range(0, len(limits), batch_size):
+            batch = limits[batch_start:batch_start + batch_size]
+            possible = np.all(self.maxima[np.newaxis, :, :] <= batch[:, np.newaxis, :], axis=2)
+            output[batch_start:batch_start + batch_size] = possible.astype(np.int64) @ self.game_ids
+        return output
+
+    def get_minimum_possible_cubes(self) -> dict[int,tuple[int,int,int]]:
+        '''Returns a dictionary: `{ID: (minimum_r, minimum_g, minimum_b)}`'''
+        return {game_id: tuple(maxima) for game_id, maxima in zip(self.game_ids.tolist(), self.maxima.tolist())}
+
 def product(numbers:Iterable[int|float]) -> int:
     '''Returns the product of all numbers in the input.'''
     output = 1
@@ -180,7 +322,7 @@ def product(numbers:Iterable[int|float]) -> int:
 
 def main() -> None:
     document_string = load_document("Input.txt")
-    parsed_input = parse_input(document_string)
+    parsed_input = parse_input_fast(document_string)
     possible_game_ids = get_possible_game_ids(parsed_input, (12, 13, 14))
     print("Part 1: %i" % sum(possible_game_ids))
     minimum_cubes = get_minimum_possible_cubes(parsed_input)
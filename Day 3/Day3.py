@@ -1,43 +1,66 @@
+import re
+from collections import deque
 from pathlib2 import Path
+from typing import Callable, Generator, Iterable
 
-def load_document(name:str) -> str:
+def get_document_path(name:str|Path) -> Path:
     if isinstance(name, str):
         name = parent_path.joinpath(name)
     path = Path(name)
     if parent_path not in path.parents:
         raise FileNotFoundError("File is not in the correct directory!")
-    with open(path, "rt") as file:
+    return path
+
+def load_document(name:str|Path) -> str:
+    with open(get_document_path(name), "rt") as file:
         return file.read()
 
+NUMBER_PATTERN = re.compile(r"\d+")
+SYMBOL_PATTERN = re.compile(r"[^.\d]")
+
 class Number():
-    def __init__(self, amount:int, positions:list[tuple[int,int]]) -> None:
+    '''A number stored as the span `start <= x < stop` of the row `y`.'''
+    __slots__ = ("amount", "y", "start", "stop", "adjacent_symbols")
+
+    def __init__(self, amount:int, y:int, start:int, stop:int) -> None:
         if not isinstance(amount, int):
             raise TypeError("`amount` is not an int!")
         if amount <= 0:
             raise ValueError("`amount` is less than or equal to 0!")
-        if not isinstance(positions, list):
-            raise TypeError("`positions` is not a list1")
-        if not all(isinstance(position, tuple) for position in positions):
-            raise TypeError("A position in `positions` is not a tuple!")
-        if len(positions) == 0:
-            raise ValueError("`positions` is length 0!")
-        if not all(len(position) == 2 for position in positions):
-            raise ValueError("A position in `positions` is not length 2!")
+        if not all(isinstance(coordinate, int) for coordinate in (y, start, stop)):
+            raise TypeError("A coordinate of the span is not an int!")
+        if stop <= start:
+            raise ValueError("Span is length 0!")
         
         self.amount = amount
-        self.positions = positions
+        self.y = y
+        self.start = start
+        self.stop = stop
         self.adjacent_symbols:list[Symbol] = []
     
+    @property
+    def positions(self) -> list[tuple[int,int]]:
+        return [(x, self.y) for x in range(self.start, self.stop)]
+    
     def get_adjacent_spaces(self, dimensions:tuple[int,int]) -> list[tuple[int,int]]:
-        adjacent_positions:set[tuple[int,int]] = set()
-        for x, y in self.positions:
-            adjacent_positions.update([(x+1,y+1),(x+1,y),(x+1,y-1),(x,y+1),(x,y-1),(x-1,y+1),(x-1,y),(x-1,y-1)])
-        return sorted(position for position in adjacent_positions if position[0] >= 0 and position[0] < dimensions[0] and position[1] >= 0 and position[1] < dimensions[1])
+        '''Returns the positions around this Number's span in row-major order.'''
+        min_x, max_x = max(self.start - 1, 0), min(self.stop, dimensions[0] - 1)
+        output:list[tuple[int,int]] = []
+        for y in (self.y - 1, self.y, self.y + 1):
+            if y < 0 or y >= dimensions[1]: continue
+            if y == self.y:
+                if self.start - 1 >= 0: output.append((self.start - 1, y))
+                if self.stop < dimensions[0]: output.append((self.stop, y))
+            else:
+                output.extend((x, y) for x in range(min_x, max_x + 1))
+        return output
     
     def __repr__(self) -> str:
-        return "<Number %i at %s-%s>" % (self.amount, self.positions[0], self.positions[-1])
+        return "<Number %i at %s-%s>" % (self.amount, (self.start, self.y), (self.stop - 1, self.y))
 
 class Symbol():
+    __slots__ = ("symbol", "position", "adjacent_numbers")
+
     def __init__(self, symbol:str, position:tuple[int,int]) -> None:
         self.symbol = symbol
         self.position = position
@@ -51,54 +74,115 @@ class Schematic():
         self.document_string = document_string
         self.numbers:list[Number] = []
         self.symbols:list[Symbol] = []
+        self.symbol_positions:dict[tuple[int,int],Symbol] = {}
+        self.symbol_index:dict[str,dict[int,list[Symbol]]] = None # {symbol: {adjacent number count: [Symbol]}}
         self.dimensions:tuple[int,int] = None
     
     def parse(self) -> None:
         '''Sets this Schematic's numbers and symbols.'''
-        current_digits = ""
-        current_digit_positions:list[tuple[int,int]] = []
-        for y, line in enumerate(self.document_string.split("\n")):
-            for x, char in enumerate(line):
-                if char == ".":
-                    if len(current_digits) > 0:
-                        self.numbers.append(Number(int(current_digits), current_digit_positions))
-                        current_digits = ""
-                        current_digit_positions = []
-                elif char.isdigit():
-                    current_digits += char
-                    current_digit_positions.append((x, y))
-                else:
-                    if len(current_digits) > 0:
-                        self.numbers.append(Number(int(current_digits), current_digit_positions))
-                        current_digits = ""
-                        current_digit_positions = []
-                    self.symbols.append(Symbol(char, (x, y)))
-            if len(current_digits) > 0:
-                self.numbers.append(Number(int(current_digits), current_digit_positions))
-                current_digits = ""
-                current_digit_positions = []
-        self.dimensions = (x+1, y+1)
+        lines = self.document_string.split("\n")
+        for y, line in enumerate(lines):
+            for match in NUMBER_PATTERN.finditer(line):
+                self.numbers.append(Number(int(match.group()), y, match.start(), match.end()))
+            for match in SYMBOL_PATTERN.finditer(line):
+                symbol = Symbol(match.group(), (match.start(), y))
+                self.symbols.append(symbol)
+                self.symbol_positions[symbol.position] = symbol
+        self.dimensions = (max(len(line) for line in lines), len(lines))
     
-    def get_symbol_adjacent_numbers(self) -> list[Number]:
-        output:list[Number] = []
+    def build_symbol_index(self) -> None:
+        '''Links every Number to its adjacent Symbols and vice versa, then indexes the Symbols by character and by number of
+        adjacent Numbers. Does nothing if the index is already built.'''
+        if self.symbol_index is not None: return
         for number in self.numbers:
-            adjacent_positions = number.get_adjacent_spaces(self.dimensions)
-            for symbol in self.symbols:
-                if symbol.position in adjacent_positions:
-                    output.append(number)
+            for position in number.get_adjacent_spaces(self.dimensions):
+                if (symbol := self.symbol_positions.get(position)) is not None:
                     number.adjacent_symbols.append(symbol)
                     symbol.adjacent_numbers.append(number)
+        self.symbol_index = {}
+        for symbol in self.symbols:
+            self.symbol_index.setdefault(symbol.symbol, {}).setdefault(len(symbol.adjacent_numbers), []).append(symbol)
+    
+    def get_symbol_adjacent_numbers(self) -> list[Number]:
+        '''Returns each Number once for every Symbol it is adjacent to.'''
+        self.build_symbol_index()
+        return [number for number in self.numbers for symbol in number.adjacent_symbols]
+    
+    def query_symbols(self, symbols:Iterable[str], arity:int|None=None, aggregate:Callable[[list[int]],int]=sum) -> list[int]:
+        '''Returns `aggregate` of the adjacent Numbers' amounts for every Symbol whose character is in `symbols` and, if `arity`
+        is given, that is adjacent to exactly `arity` Numbers.'''
+        self.build_symbol_index()
+        output:list[int] = []
+        for symbol_character in symbols:
+            symbols_by_arity = self.symbol_index.get(symbol_character, {})
+            matching_lists = symbols_by_arity.values() if arity is None else [symbols_by_arity.get(arity, [])]
+            for matching_symbols in matching_lists:
+                output.extend(aggregate([number.amount for number in symbol.adjacent_numbers]) for symbol in matching_symbols)
         return output
     
     def get_gear_ratios(self) -> list[int]:
         GEAR_SYMBOL = "*"
-        output:list[int] = []
-        for symbol in self.symbols:
-            if symbol.symbol == GEAR_SYMBOL and len(symbol.adjacent_numbers) == 2:
-                output.append(symbol.adjacent_numbers[0].amount * symbol.adjacent_numbers[1].amount)
-            else:
-                continue
-        return output
+        return self.query_symbols(GEAR_SYMBOL, 2, product)
+
+def product(numbers:Iterable[int]) -> int:
+    '''Returns the product of all numbers in the input.'''
+    output = 1
+    for number in numbers:
+        output *= number
+    return output
+
+class Row():
+    '''One row of a schematic, as kept in the window of `iterate_schematic_sums`.'''
+    __slots__ = ("numbers", "symbols", "number_columns")
+
+    def __init__(self, line:str) -> None:
+        self.numbers:list[tuple[int,int,int]] = [(int(match.group()), match.start(), match.end()) for match in NUMBER_PATTERN.finditer(line)]
+        self.symbols:dict[int,str] = {match.start(): match.group() for match in SYMBOL_PATTERN.finditer(line)}
+        self.number_columns:dict[int,int] = {x: number_index for number_index, (amount, start, stop) in enumerate(self.numbers) for x in range(start, stop)}
+
+def get_row_sums(previous_row:Row, row:Row, next_row:Row) -> tuple[int,int]:
+    '''Returns `(part_number_sum, gear_ratio_sum)` for the numbers and symbols of `row`.'''
+    GEAR_SYMBOL = "*"
+    part_number_sum = 0
+    for amount, start, stop in row.numbers:
+        adjacent_symbol_count = (start - 1 in row.symbols) + (stop in row.symbols)
+        for other_row in (previous_row, next_row):
+            adjacent_symbol_count += sum(x in other_row.symbols for x in range(start - 1, stop + 1))
+        part_number_sum += amount * adjacent_symbol_count
+    gear_ratio_sum = 0
+    for x, symbol in row.symbols.items():
+        if symbol != GEAR_SYMBOL: continue
+        adjacent_numbers:list[int] = []
+        for other_row in (previous_row, row, next_row):
+            number_indices = {other_row.number_columns[column] for column in (x - 1, x, x + 1) if column in other_row.number_columns}
+            adjacent_numbers.extend(other_row.numbers[number_index][0] for number_index in number_indices)
+        if len(adjacent_numbers) == 2:
+            gear_ratio_sum += adjacent_numbers[0] * adjacent_numbers[1]
+    return part_number_sum, gear_ratio_sum
+
+def iterate_schematic_sums(lines:Iterable[str]) -> Generator[tuple[int,int],None,None]:
+    '''Reads a schematic one row at a time (e.g. from a file object), keeping only three rows in memory. Yields the running
+    `(part_number_sum, gear_ratio_sum)` each time a row is finished.'''
+    part_number_sum = 0
+    gear_ratio_sum = 0
+    window:deque[Row] = deque([Row("")], maxlen=3)
+    for line in lines:
+        window.append(Row(line.removesuffix("\n")))
+        if len(window) == 3:
+            row_part_number_sum, row_gear_ratio_sum = get_row_sums(*window)
+            part_number_sum += row_part_number_sum
+            gear_ratio_sum += row_gear_ratio_sum
+            yield part_number_sum, gear_ratio_sum
+    if len(window) >= 2:
+        row_part_number_sum, row_gear_ratio_sum = get_row_sums(window[-2], window[-1], Row(""))
+        yield part_number_sum + row_part_number_sum, gear_ratio_sum + row_gear_ratio_sum
+
+def get_answers_streaming(name:str|Path) -> tuple[int,int]:
+    '''Returns `(part_1_answer, part_2_answer)` for a schematic document while only holding three rows in memory.'''
+    answers = (0, 0)
+    with open(get_document_path(name), "rt") as file:
+        for answers in iterate_schematic_sums(file): pass
+    return answers
 
 def get_debug_report(numbers:list[Number], store_in_file:bool=True) -> False:
     report = ""
@@ -1,4 +1,6 @@
+from collections import deque
 from pathlib2 import Path
+from typing import Generator, Iterable
 
 def load_document(name:str) -> str:
     if isinstance(name, str):
@@ -9,35 +11,68 @@ def load_document(name:str) -> str:
     with open(path, "rt") as file:
         return file.read()
 
-def parse_cards(document:str) -> list[tuple[set[int],set[int]]]:
-    output:list[tuple[set[int],set[int]]] = []
-    for line in document.split("\n"):
+def parse_number_mask(numbers_string:str) -> int:
+    '''Parses "41 48 83" into an int with the bits 41, 48 and 83 set.'''
+    mask = 0
+    for item in numbers_string.split():
+        mask |= 1 << int(item)
+    return mask
+
+def iterate_cards(lines:Iterable[str]) -> Generator[tuple[int,int],None,None]:
+    '''Yields `(winning_numbers, my_numbers)` for each card line, both as bitmasks of the numbers on it.'''
+    for line in lines:
         card_number, data = line.split(": ")
         set1_string, set2_string = data.split(" | ")
-        set1 = {int(item.strip()) for item in set1_string.split(" ") if len(item) > 0}
-        set2 = {int(item.strip()) for item in set2_string.split(" ") if len(item) > 0}
-        output.append((set1, set2))
-    return output
-
-def get_points(cards:list[tuple[set[int],set[int]]]) -> list[int]:
-    return [2**(len(intersection) - 1) if len(intersection := winning_numbers.intersection(my_numbers)) > 0 else 0 for winning_numbers, my_numbers in cards]
-
-def get_card_copies(cards:list[tuple[set[int],set[int]]]) -> list[int]:
-    '''Returns list of how many copies of each card are had (including first ones).'''
-    copies = [1] * len(cards)
-    for card_index, card in enumerate(cards):
-        winning_numbers, my_numbers = card
-        matching_amount = len(winning_numbers.intersection(my_numbers))
-        for card_to_copy_index in range(card_index + 1, card_index + matching_amount + 1):
-            copies[card_to_copy_index] += copies[card_index]
+        yield parse_number_mask(set1_string), parse_number_mask(set2_string)
+
+def parse_cards(document:str) -> list[tuple[int,int]]:
+    return list(iterate_cards(document.split("\n")))
+
+def get_match_counts(cards:list[tuple[int,int]]) -> list[int]:
+    '''Returns how many of each card's numbers are winning numbers.'''
+    return [(winning_numbers & my_numbers).bit_count() for winning_numbers, my_numbers in cards]
+
+def get_points(match_counts:list[int]) -> list[int]:
+    return [2**(matching_amount - 1) if matching_amount > 0 else 0 for matching_amount in match_counts]
+
+def get_card_copies(match_counts:list[int]) -> list[int]:
+    '''Returns list of how many copies of each card are had (including first ones). Each card's winnings are recorded at the
+    start and end of the range of cards they copy, and the running sum of these gives every card's extra copies.'''
+    copies:list[int] = []
+    copy_changes = [0] * (len(match_counts) + 1)
+    extra_copies = 0
+    for card_index, matching_amount in enumerate(match_counts):
+        extra_copies += copy_changes[card_index]
+        card_copies = extra_copies + 1
+        copies.append(card_copies)
+        if matching_amount > 0:
+            copy_changes[card_index + 1] += card_copies
+            copy_changes[min(card_index + matching_amount + 1, len(match_counts))] -= card_copies
     return copies
 
+def iterate_card_copies(match_counts:Iterable[int]) -> Generator[int,None,None]:
+    '''Same as `get_card_copies`, but consumes match counts lazily and yields each card's copies as soon as they are known.
+    Only the copy changes of the next `max(match_counts)` cards are kept.'''
+    copy_changes:deque[int] = deque()
+    extra_copies = 0
+    for matching_amount in match_counts:
+        if len(copy_changes) > 0:
+            extra_copies += copy_changes.popleft()
+        card_copies = extra_copies + 1
+        yield card_copies
+        if matching_amount > 0:
+            if len(copy_changes) <= matching_amount:
+                copy_changes.extend([0] * (matching_amount + 1 - len(copy_changes)))
+            copy_changes[0] += card_copies
+            copy_changes[matching_amount] -= card_copies
+
 def main() -> None:
     document_string = load_document("Input.txt")
     cards = parse_cards(document_string)
-    card_points = get_points(cards)
+    match_counts = get_match_counts(cards)
+    card_points = get_points(match_counts)
     print("Part 1: %i" % sum(card_points))
-    card_copies = get_card_copies(cards)
+    card_copies = get_card_copies(match_counts)
     print("Part 2: %i" % sum(card_copies))
 
 if __name__ == "__main__":
@@ -1,3 +1,8 @@
+import math
+import numpy as np
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from functools import reduce
 from pathlib2 import Path
 from typing import Any, Generator, Union
 
@@ -47,22 +52,85 @@ class MapRange():
 
 class MapLayer():
     def __init__(self, maps:list[MapRange]) -> None:
-        self.maps = maps
+        self.maps = sorted((map for map in maps if len(map) > 0), key=lambda map: map.source)
+        for map1, map2 in zip(self.maps[:-1], self.maps[1:]):
+            if map2.source < map1.source_end:
+                raise ValueError("%s and %s overlap!" % (repr(map1), repr(map2)))
+        # parallel to `self.maps`, for bisecting
+        self.sources = [map.source for map in self.maps]
+        self.source_ends = [map.source_end for map in self.maps]
+        self.offsets = [map.offset for map in self.maps]
+        self.boundaries = sorted(set(self.sources + self.source_ends))
+        self.source_array = np.array(self.sources, dtype=np.int64)
+        self.source_end_array = np.array(self.source_ends, dtype=np.int64)
+        self.offset_array = np.array(self.offsets, dtype=np.int64)
+    
+    def get_map_range(self, value:int) -> MapRange|None:
+        '''Returns the MapRange whose source contains `value`, or None if there is none.'''
+        index = bisect_right(self.sources, value) - 1
+        if index >= 0 and value < self.source_ends[index]:
+            return self.maps[index]
+        else: return None
+    
+    def map_array(self, values:np.ndarray) -> np.ndarray:
+        '''Maps every value of an int64 array at once.'''
+        if len(self.maps) == 0: return values.copy()
+        indices = np.searchsorted(self.source_array, values, side="right") - 1
+        clipped_indices = np.maximum(indices, 0)
+        inside = (indices >= 0) & (values < self.source_end_array[clipped_indices])
+        return values + np.where(inside, self.offset_array[clipped_indices], 0)
+    
+    def get_offset(self, value:int|float) -> int:
+        map = self.get_map_range(value)
+        return 0 if map is None else map.offset
+    
+    def get_pieces(self) -> list[tuple[int|float,int|float,int]]:
+        '''Returns `(source_start, source_end, offset)` for every stretch of the number line, from -inf to inf, including the
+        unmapped stretches between MapRanges (which have offset 0).'''
+        pieces:list[tuple[int|float,int|float,int]] = []
+        previous_end = -math.inf
+        for map in self.maps:
+            if map.source > previous_end:
+                pieces.append((previous_end, map.source, 0))
+            pieces.append((map.source, map.source_end, map.offset))
+            previous_end = map.source_end
+        pieces.append((previous_end, math.inf, 0))
+        return pieces
+    
+    def get_preimage(self, destination_range:"SeedRange") -> list["SeedRange"]:
+        '''Returns the source ranges whose values this MapLayer maps into `destination_range`.'''
+        source_ranges:list[SeedRange] = []
+        for start, end, offset in self.get_pieces():
+            source_start = max(start, destination_range.start - offset)
+            source_end = min(end, destination_range.end - offset)
+            if source_start < source_end:
+                source_ranges.append(SeedRange(source_start, source_end - source_start))
+        return coalesce_ranges(source_ranges)
+    
+    def compose(self, other:"MapLayer") -> "MapLayer":
+        '''Returns a MapLayer that maps values the same as this MapLayer followed by `other`.'''
+        maps:list[MapRange] = []
+        for start, end, offset in self.get_pieces():
+            # cut this piece wherever its image crosses a boundary of `other`
+            image_boundaries = other.boundaries[bisect_right(other.boundaries, start + offset):bisect_left(other.boundaries, end + offset)]
+            cut_points = [start] + [boundary - offset for boundary in image_boundaries] + [end]
+            for piece_start, piece_end in zip(cut_points[:-1], cut_points[1:]):
+                total_offset = offset + other.get_offset(piece_start + offset)
+                if total_offset == 0: continue # also true of both infinite pieces
+                if len(maps) > 0 and maps[-1].source_end == piece_start and maps[-1].offset == total_offset:
+                    piece_start = maps.pop().source
+                maps.append(MapRange(piece_start + total_offset, piece_start, piece_end - piece_start))
+        return MapLayer(maps)
     
     def __add__(self, other_value:Union[int, "SeedRange"]) -> Union[int, "SeedRange"]:
         if isinstance(other_value, int):
-            for map in self.maps:
-                if other_value in map:
-                    return map + other_value
-            else:
-                return other_value
+            map = self.get_map_range(other_value)
+            return other_value if map is None else map + other_value
         elif isinstance(other_value, SeedRange):
-            for map in self.maps:
-                if other_value.start in map:
-                    assert other_value.end - 1 in map # if this is errors then oh shit
-                    return map + other_value
-            else:
-                return other_value
+            map = self.get_map_range(other_value.start)
+            if map is None: return other_value
+            assert other_value.end - 1 in map # if this is errors then oh shit
+            return map + other_value
         else:
             raise NotImplementedError("Attempted to add MapLayer + %s" % str(type(other_value)))
     
@@ -104,26 +172,11 @@ class SeedRange():
         return "<SeedRange %i–%i len %i>" % (self.start, self.end, self.length)
 
     def slice_range(self, map_layer:MapLayer) -> list["SeedRange"]:
-        start_stop:list[int] = []
-        for map_range in map_layer:
-            start_stop.append(map_range.source)
-            start_stop.append(map_range.source_end)
-        start_stop.sort() # this line took me a while to get
-        start_stop_trimmed = [position for position in start_stop if position >= self.start and position < self.end]
-        if len(start_stop_trimmed) == 0: return [self]
-        if start_stop_trimmed[0] != self.start: start_stop_trimmed.insert(0, self.start)
-        if start_stop_trimmed[-1] != self.end: start_stop_trimmed.append(self.end)
-        starts:list[int] = []; stops:list[int] = []
-        for index, position in enumerate(start_stop_trimmed):
-            if index != len(start_stop_trimmed) - 1: # if it is not the last one
-                starts.append(position)
-            if index != 0: # if it is not the first one
-                stops.append(position)
-        continuous_ranges = [(start, stop) for start, stop in zip(starts, stops) if start != stop]
-        # list of tuples such that last of one is one less than first of next.
-        # In `continuous_ranges`, start is SeedRange's start; end is SeedRange's end. Items of list correspond to map_layer items.
-        # when stop and start are same, no gap between ranges. Still needs to be differentiated though b.c. different offsets.
-        return [SeedRange(start, stop - start) for start, stop in continuous_ranges]
+        '''Cuts this SeedRange at every boundary of `map_layer` that lies inside it, so that each piece is mapped by at most one
+        MapRange.'''
+        cut_points = [self.start] + map_layer.boundaries[bisect_right(map_layer.boundaries, self.start):bisect_left(map_layer.boundaries, self.end)] + [self.end]
+        if len(cut_points) == 2: return [self]
+        return [SeedRange(start, stop - start) for start, stop in zip(cut_points[:-1], cut_points[1:])]
 
 def adjacent_pairs(_list:list[Any]) -> Generator[Any, None, None]:
     return zip(_list[:-1:2], _list[1::2])
@@ -165,11 +218,25 @@ def parse_almanac(document:str, parse_seeds_as_ranges:bool) -> tuple[list[int],l
     return seeds, map_layers
 
 def check_for_overlap(seed_ranges:list[SeedRange]) -> None:
-    for seed_layer1 in seed_ranges:
-        for seed_layer2 in seed_ranges:
-            if seed_layer1 is seed_layer2: continue
-            if seed_layer1.start in seed_layer2 or seed_layer1.end in seed_layer2:
-                raise RuntimeError("%s and %s overlap!" % (repr(seed_layer1), repr(seed_layer2)))
+    '''Raises a RuntimeError if any two SeedRanges share a seed. Sweeps the ranges in order of their starts, keeping the range
+    that reaches furthest so far.'''
+    furthest_range:SeedRange|None = None
+    for seed_range in sorted((seed_range for seed_range in seed_ranges if seed_range.length > 0), key=lambda seed_range: seed_range.start):
+        if furthest_range is not None and seed_range.start < furthest_range.end:
+            raise RuntimeError("%s and %s overlap!" % (repr(furthest_range), repr(seed_range)))
+        if furthest_range is None or seed_range.end > furthest_range.end:
+            furthest_range = seed_range
+
+def coalesce_ranges(seed_ranges:list[SeedRange]) -> list[SeedRange]:
+    '''Returns the SeedRanges sorted by start, with overlapping and touching ones merged and empty ones dropped.'''
+    output:list[SeedRange] = []
+    for seed_range in sorted((seed_range for seed_range in seed_ranges if seed_range.length > 0), key=lambda seed_range: seed_range.start):
+        if len(output) > 0 and seed_range.start <= output[-1].end:
+            if seed_range.end > output[-1].end:
+                output[-1] = SeedRange(output[-1].start, seed_range.end - output[-1].start)
+        else:
+            output.append(seed_range)
+    return output
 
 def flatten(_list:list[list[Any]]) -> list[Any]:
     return [item for sublist in _list for item in sublist]
@@ -181,19 +248,85 @@ def get_locations_individual(seeds:list[int], map_layers:list[MapLayer]) -> Gene
             location = map_layer + location
         yield location
 
+def get_locations_array(seeds:np.ndarray, map_layers:list[MapLayer]) -> np.ndarray:
+    '''Same as `get_locations_individual`, but maps a whole int64 array of seeds through each layer at once.'''
+    locations = np.asarray(seeds, dtype=np.int64)
+    for map_layer in map_layers:
+        locations = map_layer.map_array(locations)
+    return locations
+
 def get_locations_range(seed_ranges:list[SeedRange], map_layers:list[MapLayer]) -> list[SeedRange]:
     for map_layer in map_layers:
         seed_ranges = flatten(seed_range.slice_range(map_layer) for seed_range in seed_ranges)
-        seed_ranges = [map_layer + seed_range for seed_range in seed_ranges]
+        seed_ranges = coalesce_ranges([map_layer + seed_range for seed_range in seed_ranges])
     return seed_ranges
 
+def compose_layers(map_layers:list[MapLayer]) -> MapLayer:
+    '''Returns a single MapLayer that maps seeds straight to locations.'''
+    return reduce(MapLayer.compose, map_layers, MapLayer([]))
+
+def get_lowest_location(seed_ranges:list[SeedRange], map_layer:MapLayer) -> int:
+    '''Returns the lowest location of any seed in `seed_ranges`. Within each piece of `map_layer` the mapping is linear, so only
+    the start of each piece overlapping a seed range needs to be checked.'''
+    return min(seed_range.start for seed_range in get_locations_range(seed_ranges, [map_layer]))
+
+def get_seeds_range(location_ranges:list[SeedRange], map_layers:list[MapLayer]) -> list[SeedRange]:
+    '''Inverse of `get_locations_range`: returns the seed ranges that map into any of `location_ranges`.'''
+    for map_layer in reversed(map_layers):
+        location_ranges = coalesce_ranges(flatten(map_layer.get_preimage(location_range) for location_range in location_ranges))
+    return location_ranges
+
+def get_lowest_location_inverse(seed_ranges:list[SeedRange], map_layer:MapLayer) -> int:
+    '''Returns the lowest location of any seed in `seed_ranges` by going through the pieces of `map_layer` in order of lowest
+    location, stopping once no remaining piece can reach below the best location found.'''
+    seed_ranges = coalesce_ranges(seed_ranges)
+    seed_starts = [seed_range.start for seed_range in seed_ranges]
+    lowest_location:int|None = None
+    for start, end, offset in sorted(map_layer.get_pieces(), key=lambda piece: piece[0] + piece[2]):
+        if lowest_location is not None and start + offset >= lowest_location: break
+        # the lowest seed in [start, end) is either `start` or the start of the first seed range after it
+        index = bisect_right(seed_starts, start) - 1
+        if index >= 0 and seed_ranges[index].end > start:
+            lowest_seed = start
+        elif index + 1 < len(seed_ranges) and seed_starts[index + 1] < end:
+            lowest_seed = seed_starts[index + 1]
+        else: continue
+        if lowest_location is None or lowest_seed + offset < lowest_location:
+            lowest_location = lowest_seed + offset
+    if lowest_location is None:
+        raise ValueError("No seeds are given!")
+    return lowest_location
+
+worker_map_layers:list[MapLayer] = [] # set in each worker process of `get_lowest_location_parallel`
+
+def set_worker_map_layers(layer_tuples:list[list[tuple[int,int,int]]]) -> None:
+    global worker_map_layers
+    worker_map_layers = [MapLayer([MapRange(*map_tuple) for map_tuple in layer]) for layer in layer_tuples]
+
+def get_shard_lowest_location(shard:list[tuple[int,int]]) -> int|None:
+    '''Returns the lowest location of a shard of `(start, length)` seed ranges, or None if they contain no seeds.'''
+    seed_ranges = [SeedRange(start, length) for start, length in shard]
+    return min((seed_range.start for seed_range in get_locations_range(seed_ranges, worker_map_layers)), default=None)
+
+def get_lowest_location_parallel(seed_ranges:list[SeedRange], map_layers:list[MapLayer], shard_size:int=1024, workers:int|None=None) -> int:
+    '''Returns the lowest location of any seed in `seed_ranges`, splitting the seed ranges into shards that are run through the
+    layers on a process pool. Each worker receives the layers once; shards and results are sent as plain tuples and ints.'''
+    layer_tuples = [[(map.destination, map.source, map.length) for map in map_layer] for map_layer in map_layers]
+    shards = [[(seed_range.start, seed_range.length) for seed_range in seed_ranges[shard_start:shard_start + shard_size]] for shard_start in range(0, len(seed_ranges), shard_size)]
+    with ProcessPoolExecutor(workers, initializer=set_worker_map_layers, initargs=(layer_tuples,)) as executor:
+        shard_locations = [location for location in executor.map(get_shard_lowest_location, shards) if location is not None]
+    if len(shard_locations) == 0:
+        raise ValueError("No seeds are given!")
+    return min(shard_locations)
+
 def main() -> None:
     document_string = load_document("Input.txt")
     seeds, maps = parse_almanac(document_string, False)
-    lowest_seed_number = min(get_locations_individual(seeds, maps))
+    almanac = compose_layers(maps)
+    lowest_seed_number = min(almanac + seed for seed in seeds)
     print("Part 1: %i" % lowest_seed_number)
     seeds, maps = parse_almanac(document_string, True)
-    lowest_seed_number = min(seed_range.start for seed_range in get_locations_range(seeds, maps))
+    lowest_seed_number = get_lowest_location(seeds, almanac)
     print("Part 2: %i" % lowest_seed_number)
 
 if __name__ == "__main__":
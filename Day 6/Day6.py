@@ -1,5 +1,7 @@
 import math
+import numpy as np
 from pathlib2 import Path
+from typing import Iterable
 
 def load_document(name:str) -> str:
     if isinstance(name, str):
@@ -24,16 +26,47 @@ def parse_document_no_kerning(document:str) -> tuple[int,int]:
     distance = int(distance_line.replace("Distance:", "").replace(" ", ""))
     return time, distance
 
-def quadratic_formula(time:int, distance:int) -> tuple[float, float]:
-    return (
-        (time - math.sqrt(time**2 - 4 * distance)) / 2,
-        (time + math.sqrt(time**2 - 4 * distance)) / 2
-    )
+# largest values for which `time**2` and `4 * distance` cannot overflow an int64
+INT64_SAFE_TIME = 2**31
+INT64_SAFE_DISTANCE = 2**60
 
-def get_number_of_integers_in_range(start:float, stop:float) -> int:
-    count = math.floor(stop) - math.floor(start)
-    if stop.is_integer(): count -= 1
-    return count
+def count_winning_holds(time:int, distance:int) -> int:
+    '''Returns how many whole hold times travel further than `distance`, i.e. how many integers `hold` satisfy
+    `hold * (time - hold) > distance`. Uses only integer arithmetic, so it is exact for any size of input.'''
+    discriminant = time**2 - 4 * distance
+    if discriminant < 0: return 0
+    # the lower root lies in ((time - isqrt - 1) / 2, (time - isqrt) / 2], so the lowest winning hold is this or one more
+    lowest_hold = (time - math.isqrt(discriminant)) // 2
+    if lowest_hold * (time - lowest_hold) <= distance:
+        lowest_hold += 1
+    return max(0, time - 2 * lowest_hold + 1)
+
+def count_winning_holds_int64(times:np.ndarray, distances:np.ndarray) -> np.ndarray:
+    '''Vectorized `count_winning_holds` for int64 arrays with every time below `INT64_SAFE_TIME` and every distance below
+    `INT64_SAFE_DISTANCE`.'''
+    discriminants = times * times - 4 * distances
+    valid = discriminants >= 0
+    discriminants = np.where(valid, discriminants, 0)
+    # the float square root can be off by one either way, so correct it with integer comparisons
+    roots = np.floor(np.sqrt(discriminants.astype(np.float64))).astype(np.int64)
+    roots -= roots * roots > discriminants
+    roots += (roots + 1) * (roots + 1) <= discriminants
+    lowest_holds = (times - roots) // 2
+    lowest_holds += lowest_holds * (times - lowest_holds) <= distances
+    return np.where(valid, np.maximum(0, times - 2 * lowest_holds + 1), 0)
+
+def count_winning_holds_batch(times:Iterable[int], distances:Iterable[int]) -> list[int]:
+    '''Returns `count_winning_holds` of every race. Races small enough for int64 arithmetic are solved together with NumPy; the
+    rest fall back to Python ints.'''
+    times = np.asarray(list(times) if not isinstance(times, np.ndarray) else times)
+    distances = np.asarray(list(distances) if not isinstance(distances, np.ndarray) else distances)
+    if times.shape != distances.shape:
+        raise ValueError("`times` and `distances` are different lengths!")
+    fits = (times >= 0) & (times < INT64_SAFE_TIME) & (distances >= 0) & (distances < INT64_SAFE_DISTANCE)
+    output = np.zeros(len(times), dtype=object)
+    output[fits] = count_winning_holds_int64(times[fits].astype(np.int64), distances[fits].astype(np.int64)).tolist()
+    output[~fits] = [count_winning_holds(int(time), int(distance)) for time, distance in zip(times[~fits], distances[~fits])]
+    return output.tolist()
 
 def product(_list:list[int|float]) -> int|float:
     output = 1
@@ -44,10 +77,10 @@ def product(_list:list[int|float]) -> int|float:
 def main() -> None:
     document_string = load_document("Input.txt")
     races = parse_document_with_kerning(document_string)
-    number_of_ways = [get_number_of_integers_in_range(*quadratic_formula(time, distance)) for time, distance in races]
+    number_of_ways = count_winning_holds_batch(*zip(*races))
     print("Part 1: %i" % product(number_of_ways))
     race = parse_document_no_kerning(document_string)
-    print("Part 2: %i" % get_number_of_integers_in_range(*quadratic_formula(*race)))
+    print("Part 2: %i" % count_winning_holds(*race))
 
 if __name__ == "__main__":
     parent_path:Path = Path(__file__).parent
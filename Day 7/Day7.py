@@ -1,4 +1,6 @@
-from typing import Any
+import numpy as np
+from operator import attrgetter
+from typing import Any, Generator, Iterable
 from pathlib2 import Path
 
 def load_document(name:str) -> str:
@@ -39,6 +41,17 @@ THREE_HAND = HandType("three_of_a_kind", 4)
 TWO_HAND = HandType("two_pair", 3)
 ONE_HAND = HandType("one_pair", 2)
 HIGH_HAND = HandType("high_card", 1)
+HAND_TYPES_BY_COUNTS = { # {card counts, highest first: HandType}
+    (5,): FIVE_HAND,
+    (4, 1): FOUR_HAND,
+    (3, 2): FULL_HAND,
+    (3, 1, 1): THREE_HAND,
+    (2, 2, 1): TWO_HAND,
+    (2, 1, 1, 1): ONE_HAND,
+    (1, 1, 1, 1, 1): HIGH_HAND,
+}
+CARD_BITS = 4 # enough for the 13 card orders
+KEY_LIMIT = (FIVE_HAND.value + 1) << (CARD_BITS * 5) # every `Hand.key` is below this
 
 class Hand():
     def __init__(self, cards:str, bid:int, is_wild:bool, possible_cards:list[str], card_order:dict[str,int]) -> None:
@@ -50,6 +63,8 @@ class Hand():
             raise TypeError("`bid` is not an int!")
         if bid <= 0:
             raise ValueError("`bid` is less than or equal to 0!")
+        if not all(card in card_order for card in cards):
+            raise ValueError("`cards` contains an invalid card!")
         
         self.cards = cards
         self.bid = bid
@@ -58,56 +73,34 @@ class Hand():
         self.card_order = card_order
         self.hand_type:HandType = None
         self.assign_hand_type()
+        self.key = self.get_key()
     
-    def manipulate_counts_wildly(self, counts:list[int]) -> list[int]:
-        labeled_counts = {card: amount for card, amount in zip(self.possible_cards, counts)}
-        joker_count = labeled_counts["J"]
-        if joker_count == 0:
-            return counts
-        highest_count_card = None
-        highest_count_amount = 0
-        for card, amount in labeled_counts.items():
-            if amount >= highest_count_amount and card != "J":
-                highest_count_card = card
-                highest_count_amount = amount
-        new_labeled_counts = labeled_counts.copy()
-        new_labeled_counts["J"] = 0
-        new_labeled_counts[highest_count_card] = joker_count + highest_count_amount
-        return list(new_labeled_counts.values())
+    def manipulate_counts_wildly(self, card_counts:dict[str,int]) -> list[int]:
+        '''Returns the card counts, highest first, after the jokers have joined the most common other card.'''
+        counts = sorted((amount for card, amount in card_counts.items() if card != "J"), reverse=True)
+        if len(counts) == 0: counts = [0]
+        counts[0] += card_counts.get("J", 0)
+        return counts
 
     def assign_hand_type(self) -> None:
-        counts = [self.cards.count(card) for card in self.possible_cards]
+        card_counts:dict[str,int] = {}
+        for card in self.cards:
+            card_counts[card] = card_counts.get(card, 0) + 1
         if self.is_wild:
-            counts = self.manipulate_counts_wildly(counts)
-        if 5 in counts:
-            self.hand_type = FIVE_HAND
-        elif 4 in counts:
-            self.hand_type = FOUR_HAND
-        elif 3 in counts and 2 in counts:
-            self.hand_type = FULL_HAND
-        elif 3 in counts:
-            self.hand_type = THREE_HAND
-        elif counts.count(2) == 2:
-            self.hand_type = TWO_HAND
-        elif counts.count(2) == 1:
-            self.hand_type = ONE_HAND
+            counts = self.manipulate_counts_wildly(card_counts)
         else:
-            self.hand_type = HIGH_HAND
+            counts = sorted(card_counts.values(), reverse=True)
+        self.hand_type = HAND_TYPES_BY_COUNTS[tuple(counts)]
+
+    def get_key(self) -> int:
+        '''Returns an int that is higher for stronger hands: the hand type's value, followed by the order of each card.'''
+        key = self.hand_type.value
+        for card in self.cards:
+            key = key << CARD_BITS | self.card_order[card]
+        return key
 
     def __lt__(self, other_hand:"Hand") -> bool:
-        if self.hand_type is other_hand.hand_type:
-            for self_card, other_card in zip(self.cards, other_hand.cards):
-                if self.card_order[self_card] > self.card_order[other_card]:
-                    return True
-                elif self.card_order[self_card] < self.card_order[other_card]:
-                    return False
-            else:
-                return False
-        if other_hand.hand_type < self.hand_type:
-            return True
-        elif other_hand.hand_type > self.hand_type:
-            return False
-        else: raise RuntimeError("Sorting error %s and %s" % (repr(self), repr(other_hand)))
+        return self.key > other_hand.key # stronger hands sort first
     def __eq__(self, other_hand:"Hand") -> bool:
         return self.cards == other_hand.cards
         
@@ -116,32 +109,154 @@ class Hand():
     def __str__(self) -> str:
         return self.cards
 
-def parse_hands(document:str, joker:bool) -> list[Hand]:
-    output:list[Hand] = []
+def iterate_hands(lines:Iterable[str], joker:bool) -> Generator[Hand,None,None]:
     if joker:
         cards = CARDS_WILD
         order = CARD_WILD_ORDER
     else:
         cards = CARDS_TAME
         order = CARD_TAME_ORDER
-    for line in document.split("\n"):
+    for line in lines:
         hand_string, bid_string = line.split(" ")
         bid = int(bid_string)
-        hand = Hand(hand_string, bid, joker, cards, order)
-        output.append(hand)
-    return output
+        yield Hand(hand_string, bid, joker, cards, order)
+
+def parse_hands(document:str, joker:bool) -> list[Hand]:
+    return list(iterate_hands(document.split("\n"), joker))
+
+class FenwickTree():
+    '''Fenwick tree of sums over the keys `0 <= key < size`. Only nodes that have been added to are stored.'''
+    def __init__(self, size:int) -> None:
+        self.size = size
+        self.nodes:dict[int,int] = {}
+    
+    def add(self, key:int, amount:int) -> None:
+        index = key + 1
+        while index <= self.size:
+            self.nodes[index] = self.nodes.get(index, 0) + amount
+            index += index & -index
+    
+    def prefix_sum(self, stop:int) -> int:
+        '''Returns the sum of the amounts of all keys below `stop`.'''
+        total = 0
+        index = stop
+        while index > 0:
+            total += self.nodes.get(index, 0)
+            index -= index & -index
+        return total
+
+class HandBook():
+    '''Keeps the total winnings of a changing set of hands up to date. Adding or removing a hand shifts the rank of every hand
+    after it by one, so the total changes by the hand's own rank times its bid plus the bids of all hands after it, which
+    Fenwick trees of counts and bids over the hand keys give in O(log keys). Equal hands may be added more than once; they are
+    ranked in the order they were added, like the stable sort in `get_total_winnings`.'''
+    def __init__(self) -> None:
+        self.hands:dict[int,list[Hand]] = {} # {key: [Hand]}, in the order they were added
+        self.key_counts = FenwickTree(KEY_LIMIT)
+        self.key_bids = FenwickTree(KEY_LIMIT)
+        self.bid_total = 0
+        self.hand_count = 0
+        self.total_winnings = 0
+    
+    def get_stronger_bids(self, key:int) -> int:
+        '''Returns the sum of the bids of all hands with a higher key.'''
+        return self.bid_total - self.key_bids.prefix_sum(key + 1)
+    
+    def add(self, hand:Hand) -> None:
+        # goes after every hand with the same key
+        rank = self.key_counts.prefix_sum(hand.key + 1) + 1
+        self.total_winnings += rank * hand.bid + self.get_stronger_bids(hand.key)
+        self.hands.setdefault(hand.key, []).append(hand)
+        self.key_counts.add(hand.key, 1)
+        self.key_bids.add(hand.key, hand.bid)
+        self.bid_total += hand.bid
+        self.hand_count += 1
+    
+    def remove(self, hand:Hand) -> None:
+        '''Removes `hand`, or the earliest added equal hand with the same bid.'''
+        equal_hands = self.hands.get(hand.key, [])
+        position = next((index for index, equal_hand in enumerate(equal_hands) if equal_hand is hand), None)
+        if position is None:
+            position = next((index for index, equal_hand in enumerate(equal_hands) if equal_hand.bid == hand.bid), None)
+        if position is None:
+            raise ValueError("%s is not in the HandBook!" % repr(hand))
+        hand = equal_hands.pop(position)
+        if len(equal_hands) == 0: del self.hands[hand.key]
+        rank = self.key_counts.prefix_sum(hand.key) + position + 1
+        later_bids = sum(equal_hand.bid for equal_hand in equal_hands[position:]) + self.get_stronger_bids(hand.key)
+        self.total_winnings -= rank * hand.bid + later_bids
+        self.key_counts.add(hand.key, -1)
+        self.key_bids.add(hand.key, -hand.bid)
+        self.bid_total -= hand.bid
+        self.hand_count -= 1
+    
+    def add_all(self, hands:Iterable[Hand]) -> int:
+        '''Adds a batch of hands and returns the new total winnings.'''
+        for hand in hands:
+            self.add(hand)
+        return self.total_winnings
+    
+    def __len__(self) -> int:
+        return self.hand_count
+
+def get_total_winnings(hands:list[Hand]) -> int:
+    sorted_hands = sorted(hands, key=attrgetter("key"))
+    return sum(hand.bid * (index + 1) for index, hand in enumerate(sorted_hands))
+
+def encode_hands(hand_strings:list[str], card_order:dict[str,int]) -> np.ndarray:
+    '''Returns an (n, 5) uint8 matrix of the order of each card of each hand.'''
+    INVALID_CARD = 255
+    lookup_table = np.full(256, INVALID_CARD, dtype=np.uint8)
+    for card, order in card_order.items():
+        lookup_table[ord(card)] = order
+    if not all(len(hand_string) == 5 for hand_string in hand_strings):
+        raise ValueError("A hand is not length 5!")
+    ranks = lookup_table[np.frombuffer("".join(hand_strings).encode("ascii"), dtype=np.uint8)].reshape(-1, 5)
+    if np.any(ranks == INVALID_CARD):
+        raise ValueError("A hand contains an invalid card!")
+    return ranks
+
+def classify_hands(ranks:np.ndarray, joker_rank:int|None=None) -> np.ndarray:
+    '''Returns the `HandType.value` of every hand in an (n, 5) rank matrix. If `joker_rank` is given, cards of that rank join
+    the most common other card.'''
+    hand_count = len(ranks)
+    counts = np.bincount((np.arange(hand_count)[:, np.newaxis] * 13 + ranks).ravel(), minlength=hand_count * 13).reshape(hand_count, 13)
+    if joker_rank is not None:
+        joker_counts = counts[:, joker_rank].copy()
+        counts[:, joker_rank] = 0
+    counts.sort(axis=1)
+    highest_counts = counts[:, -1]
+    second_highest_counts = counts[:, -2]
+    if joker_rank is not None:
+        highest_counts = highest_counts + joker_counts
+    return np.select(
+        [highest_counts == 5, highest_counts == 4, (highest_counts == 3) & (second_highest_counts == 2), highest_counts == 3, (highest_counts == 2) & (second_highest_counts == 2), highest_counts == 2],
+        [FIVE_HAND.value, FOUR_HAND.value, FULL_HAND.value, THREE_HAND.value, TWO_HAND.value, ONE_HAND.value],
+        HIGH_HAND.value,
+    ).astype(np.uint8)
+
+def get_hand_keys(ranks:np.ndarray, hand_types:np.ndarray) -> np.ndarray:
+    '''Returns the same keys as `Hand.key` for every hand in an (n, 5) rank matrix.'''
+    keys = hand_types.astype(np.int64)
+    for card_index in range(5):
+        keys = keys << CARD_BITS | ranks[:, card_index]
+    return keys
+
+def get_total_winnings_batch(hand_strings:list[str], bids:list[int], joker:bool) -> int:
+    '''Same as `get_total_winnings`, but classifies and ranks all hands with array operations.'''
+    card_order = CARD_WILD_ORDER if joker else CARD_TAME_ORDER
+    ranks = encode_hands(hand_strings, card_order)
+    keys = get_hand_keys(ranks, classify_hands(ranks, card_order["J"] if joker else None))
+    sorted_bids = np.asarray(bids, dtype=np.int64)[np.argsort(keys, kind="stable")]
+    return int(np.sum(sorted_bids * np.arange(1, len(sorted_bids) + 1)))
 
 def main() -> None:
     document_string = load_document("Input.txt")
     hands = parse_hands(document_string, joker=False)
-    sorted_hands = sorted(hands, reverse=True)
-    points = [hand.bid * (index + 1) for index, hand in enumerate(sorted_hands)]
-    print("Part 1: %i" % sum(points))
+    print("Part 1: %i" % get_total_winnings(hands))
 
     hands = parse_hands(document_string, joker=True)
-    sorted_hands = sorted(hands, reverse=True)
-    points = [hand.bid * (index + 1) for index, hand in enumerate(sorted_hands)]
-    print("Part 2: %i" % sum(points))
+    print("Part 2: %i" % get_total_winnings(hands))
 
 if __name__ == "__main__":
     parent_path:Path = Path(__file__).parent
@@ -1,4 +1,6 @@
-from math import lcm
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from math import gcd, lcm
 from pathlib import Path
 
 def load_document(name:str) -> str:
@@ -24,11 +26,6 @@ class Node():
         self.left = left
         self.right = right
     
-    def follow(self, direction:str) -> "Node":
-        if direction is RIGHT: return self.right
-        elif direction is LEFT: return self.left
-        else: raise ValueError("Direction is not `RIGHT` or `LEFT`!")
-    
     def __repr__(self) -> str:
         return "<Node %s (%s, %s)>" % (self.name, self.left.name, self.right.name)
 
@@ -63,33 +60,81 @@ class Map():
         self.ZZZ_node = ZZZ_node
         self.A_nodes = A_nodes
         self.Z_nodes = Z_nodes
+        self.compile()
     
-    def __getitem__(self, index:int) -> Node:
-        return self.instructions[index % len(self.instructions)]
-    def get_mod_index(self, index:int) -> int:
-        return index % len(self.instructions)
+    def compile(self) -> None:
+        '''Numbers the nodes by their position in `nodes` and builds flat tables of where each one connects to, so that stepping
+        is integer indexing.'''
+        self.node_indices:dict[Node,int] = {node: node_index for node_index, node in enumerate(self.nodes)}
+        self.left = array("i", [self.node_indices[node.left] for node in self.nodes])
+        self.right = array("i", [self.node_indices[node.right] for node in self.nodes])
+        self.instruction_bits = bytes(instruction is RIGHT for instruction in self.instructions) # 1 for `RIGHT`
+        # `instruction_tables[i]` is `right` or `left`, for the instruction at index `i`
+        self.instruction_tables = [self.right if bit else self.left for bit in self.instruction_bits]
     
     def __repr__(self) -> str:
         return "<Map instr-len %i node-len %i>" % (len(self.instructions), len(self.nodes))
 
-class Ghost():
-    def __init__(self, start_node:Node) -> None:
-        if not isinstance(start_node, Node):
-            raise TypeError("`start_node` is not a Node!")
-        
-        self.node = start_node
-        self.visited_nodes:dict[tuple[Node,int],int] = {} # the tuple is (node, instruction_index_mod)
-        self.has_found_cycle = False
-        self.cycle_length = None
-
-    def follow(self, direction:str, instruction_index:int, instruction_index_mod:int) -> None:
-        new_node = self.node.follow(direction)
-        self.node = new_node
-        if not self.has_found_cycle and (new_node, instruction_index_mod) in self.visited_nodes:
-            self.has_found_cycle = True
-            self.cycle_length = instruction_index - self.visited_nodes[(new_node, instruction_index_mod)]
-        if not self.has_found_cycle:
-            self.visited_nodes[(new_node, instruction_index_mod)] = instruction_index
+class PassTable():
+    '''Jump tables over whole passes of a Map's instructions. `jumps[k][node]` is the node reached after `2**k` passes from
+    `node`, and `hits_within[k][node]` is whether any target node is reached during those passes. `pass_hits[node]` lists the
+    `(step, target_node)`s reached during one pass from `node`, with steps counted from 1.'''
+    def __init__(self, map:Map, targets:set[int]) -> None:
+        self.pass_length = len(map.instructions)
+        self.node_count = len(map.nodes)
+        self.targets = targets
+        pass_ends = array("i", [0] * self.node_count)
+        self.pass_hits:list[tuple[tuple[int,int],...]] = []
+        for start_node in range(self.node_count):
+            node = start_node
+            hits:list[tuple[int,int]] = []
+            for step, table in enumerate(map.instruction_tables, start=1):
+                node = table[node]
+                if node in targets: hits.append((step, node))
+            pass_ends[start_node] = node
+            self.pass_hits.append(tuple(hits))
+        self.jumps:list[array] = [pass_ends]
+        self.hits_within:list[bytes] = [bytes(len(hits) > 0 for hits in self.pass_hits)]
+        # a node can only start a pass once before the passes repeat, so `node_count` passes reach every hit there will be
+        while 2**(len(self.jumps) - 1) < self.node_count:
+            self.add_level()
+    
+    def add_level(self) -> None:
+        '''Adds the tables for twice as many passes as the current highest level.'''
+        jumps, hits_within = self.jumps[-1], self.hits_within[-1]
+        self.jumps.append(array("i", [jumps[jumps[node]] for node in range(self.node_count)]))
+        self.hits_within.append(bytes(hits_within[node] or hits_within[jumps[node]] for node in range(self.node_count)))
+    
+    def get_node_after_passes(self, node:int, passes:int) -> int:
+        while passes.bit_length() > len(self.jumps):
+            self.add_level()
+        level = 0
+        while passes > 0:
+            if passes & 1:
+                node = self.jumps[level][node]
+            passes >>= 1
+            level += 1
+        return node
+    
+    def get_node_after(self, map:Map, node:int, steps:int) -> int:
+        '''Returns the node reached after `steps` steps from `node`, in O(log steps) passes plus one partial pass.'''
+        passes, remaining_steps = divmod(steps, self.pass_length)
+        node = self.get_node_after_passes(node, passes)
+        for table in map.instruction_tables[:remaining_steps]:
+            node = table[node]
+        return node
+    
+    def get_first_hit(self, node:int) -> int|None:
+        '''Returns the number of steps it takes to first reach a target node from `node`, or None if none can be reached.'''
+        if node in self.targets: return 0
+        top_level = len(self.jumps) - 1
+        if not self.hits_within[top_level][node]: return None
+        passes = 0
+        for level in range(top_level, -1, -1):
+            if not self.hits_within[level][node]:
+                node = self.jumps[level][node]
+                passes += 2**level
+        return passes * self.pass_length + self.pass_hits[node][0][0]
 
 def parse_map(document:str) -> Map:
     lines = document.split("\n")
@@ -141,35 +186,111 @@ def parse_map(document:str) -> Map:
 
 def follow_aaa(map:Map) -> int:
     '''Returns the number of steps it takes to reach ZZZ from AAA.'''
-    node = map.AAA_node
+    node = map.node_indices[map.AAA_node]
+    ZZZ_node = map.node_indices[map.ZZZ_node]
     instruction_index = 0
-    while node is not map.ZZZ_node:
-        node = node.follow(map[instruction_index])
-        instruction_index += 1
-    return instruction_index
+    # a node can only start a pass once before the passes repeat, so ZZZ is unreachable if not reached within that many passes
+    for pass_index in range(len(map.nodes)):
+        for table in map.instruction_tables:
+            if node == ZZZ_node: return instruction_index
+            node = table[node]
+            instruction_index += 1
+    if node == ZZZ_node: return instruction_index
+    raise RuntimeError("ZZZ cannot be reached from AAA!")
 
-def follow_a(map:Map) -> list[int]:
-    '''Returns the number of steps it takes for each ghosts to enter a cycle.'''
-    ghosts = [Ghost(node) for node in map.A_nodes]
-    # z_nodes = set(map.Z_nodes)
+class GhostCycle():
+    '''The steps at which a ghost is on a target node: any step in `tail_hits`, and any step at least `tail_length` whose
+    distance past `tail_length` is congruent to one of `cycle_hits` modulo `cycle_length`.'''
+    def __init__(self, tail_length:int, cycle_length:int, tail_hits:list[int], cycle_hits:list[int]) -> None:
+        self.tail_length = tail_length
+        self.cycle_length = cycle_length
+        self.tail_hits = tail_hits
+        self.cycle_hits = cycle_hits
+        self.tail_hit_set = set(tail_hits)
+        self.cycle_hit_set = set(cycle_hits)
+    
+    def is_hit(self, step:int) -> bool:
+        return step in self.tail_hit_set or (step >= self.tail_length and (step - self.tail_length) % self.cycle_length in self.cycle_hit_set)
+    
+    def __repr__(self) -> str:
+        return "<GhostCycle tail %i cycle %i hits %i+%i>" % (self.tail_length, self.cycle_length, len(self.tail_hits), len(self.cycle_hits))
 
-    instruction_index = 0
-    while not all(ghost.has_found_cycle for ghost in ghosts):
-        instruction = map[instruction_index]
-        instruction_index_mod = map.get_mod_index(instruction_index)
-        for ghost in ghosts:
-            ghost.follow(instruction, instruction_index, instruction_index_mod)
-        instruction_index += 1
-    ghost_lengths = [ghost.cycle_length for ghost in ghosts]
-    return ghost_lengths
+def find_ghost_cycle(pass_table:PassTable, start_node:int) -> GhostCycle:
+    '''Follows a ghost one pass at a time until it starts a pass on a node it has started one on before. Since every pass starts
+    at the first instruction, that is the start of its cycle.'''
+    pass_starts:dict[int,int] = {} # {node: pass index}
+    pass_nodes:list[int] = []
+    node = start_node
+    while node not in pass_starts:
+        pass_starts[node] = len(pass_nodes)
+        pass_nodes.append(node)
+        node = pass_table.jumps[0][node]
+    tail_passes = pass_starts[node]
+    tail_length = tail_passes * pass_table.pass_length
+    cycle_length = (len(pass_nodes) - tail_passes) * pass_table.pass_length
+    tail_hits = [0] if start_node in pass_table.targets else []
+    cycle_hits:list[int] = []
+    for pass_index, pass_node in enumerate(pass_nodes):
+        for step, hit_node in pass_table.pass_hits[pass_node]:
+            step += pass_index * pass_table.pass_length
+            if step <= tail_length: tail_hits.append(step)
+            if step >= tail_length: cycle_hits.append((step - tail_length) % cycle_length)
+    return GhostCycle(tail_length, cycle_length, tail_hits, sorted(set(cycle_hits)))
+
+worker_pass_table:PassTable|None = None # set in each worker process of `find_ghost_cycles`
+
+def set_worker_pass_table(pass_table:PassTable) -> None:
+    global worker_pass_table
+    worker_pass_table = pass_table
+
+def find_worker_ghost_cycle(start_node:int) -> GhostCycle:
+    return find_ghost_cycle(worker_pass_table, start_node)
+
+def find_ghost_cycles(pass_table:PassTable, start_nodes:list[int], workers:int=1) -> list[GhostCycle]:
+    '''Finds the cycle of a ghost from each start node. With more than one worker, the ghosts are split across a process pool
+    that receives `pass_table` once per worker.'''
+    if workers == 1:
+        return [find_ghost_cycle(pass_table, start_node) for start_node in start_nodes]
+    with ProcessPoolExecutor(workers, initializer=set_worker_pass_table, initargs=(pass_table,)) as executor:
+        return list(executor.map(find_worker_ghost_cycle, start_nodes))
+
+def merge_congruences(residue1:int, modulus1:int, residue2:int, modulus2:int) -> tuple[int,int]|None:
+    '''Returns `(residue, modulus)` of the numbers congruent to both `residue1` mod `modulus1` and `residue2` mod `modulus2`,
+    or None if there are none. The moduli do not need to be coprime.'''
+    divisor = gcd(modulus1, modulus2)
+    if (residue2 - residue1) % divisor != 0: return None
+    reduced_modulus2 = modulus2 // divisor
+    multiple = (residue2 - residue1) // divisor * pow(modulus1 // divisor, -1, reduced_modulus2) % reduced_modulus2
+    modulus = lcm(modulus1, modulus2)
+    return (residue1 + modulus1 * multiple) % modulus, modulus
+
+def get_ghost_sync_steps(map:Map, workers:int=1) -> int|None:
+    '''Returns the first step at which every ghost is on a node ending in Z, or None if that never happens. Steps before every
+    ghost is in its cycle are checked against the ghosts' tail hits; after that, each combination of cycle hits is combined by
+    the Chinese remainder theorem.'''
+    pass_table = PassTable(map, {map.node_indices[node] for node in map.Z_nodes})
+    ghost_cycles = find_ghost_cycles(pass_table, [map.node_indices[node] for node in map.A_nodes], workers)
+    for step in sorted({step for ghost_cycle in ghost_cycles for step in ghost_cycle.tail_hits}):
+        if all(ghost_cycle.is_hit(step) for ghost_cycle in ghost_cycles):
+            return step
+    congruences:set[tuple[int,int]] = {(0, 1)}
+    for ghost_cycle in ghost_cycles:
+        congruences = {
+            merged
+            for residue, modulus in congruences
+            for cycle_hit in ghost_cycle.cycle_hits
+            if (merged := merge_congruences(residue, modulus, ghost_cycle.tail_length + cycle_hit, ghost_cycle.cycle_length)) is not None
+        }
+    first_cyclic_step = max((ghost_cycle.tail_length for ghost_cycle in ghost_cycles), default=0)
+    # the lowest step at or after `first_cyclic_step` for each congruence
+    return min((residue + (first_cyclic_step - residue + modulus - 1) // modulus * modulus for residue, modulus in congruences), default=None)
 
 def main() -> None:
     document_string = load_document("Input.txt")
     map = parse_map(document_string)
     aaa_to_zzz_length = follow_aaa(map)
     print("Part 1: %i" % aaa_to_zzz_length)
-    ghost_cycle_lengths = follow_a(map)
-    print("Part 2: %i" % lcm(*ghost_cycle_lengths))
+    print("Part 2: %i" % get_ghost_sync_steps(map))
 
 if __name__ == "__main__":
     parent_path:Path = Path(__file__).parent